@@ -1,13 +1,14 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.utils.cell import range_boundaries
+import numpy as np
 import unicodedata
-import re
-import altair as alt
+import os
+import hashlib
+import logging
 import plotly.express as px
 import json
+from datetime import date, datetime
 from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
@@ -15,6 +16,10 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
 
 st.set_page_config(
     page_title="Ficha de Cooperaci\u00f3n Internacional | APC Colombia",
@@ -32,6 +37,18 @@ FILE_SECTORES = "Ficha sectores.xlsx"
 GEO_FILE = "Colombia.geo.json"
 LOGO_APC = "logo_apc.png"
 LOGO_SNCIC = "logo_sncic.png"
+DEPT_COL_INFO = "Departamento"
+# Columnas de ColCol donde se buscan los departamentos participantes
+COLCOL_DEPT_COLS = ["DEPARTAMENTOS PARTICIPANTES"]
+# Columnas de texto repetitivo que se guardan como category (si tienen pocos valores distintos)
+CATEGORY_COLS = ["DEPARTAMENTO", "MUNICIPIO", "ODS", "NOMBRE ACTOR", "NOMBRE INTERVENCION"]
+CACHE_DIR = ".cache"
+# Subir CACHE_VERSION cuando cambie el procesamiento de las tablas en load_data
+CACHE_VERSION = 6
+# FICHA_NO_CACHE=1 desactiva la cache en disco (fuerza la relectura del .xlsm)
+NO_CACHE = os.environ.get("FICHA_NO_CACHE", "") not in ("", "0")
+
+logger = logging.getLogger(__name__)
 
 st.markdown("""
 <style>
@@ -447,14 +464,30 @@ div[data-testid="stDownloadButton"] button span {
 </style>
 """, unsafe_allow_html=True)
 
+# Tras pasar a ASCII en mayusculas: todo lo que no sea A-Z, 0-9 o espacio se vuelve espacio
+_NORM_TABLE = str.maketrans({
+    c: " " for c in map(chr, range(128))
+    if not (c.isspace() or "A" <= c <= "Z" or "0" <= c <= "9")
+})
+
+
 def norm_text(x):
     if x is None:
         return ""
-    s = str(x).strip().upper()
-    s = "".join(c for c in unicodedata.normalize("NFD", s) if unicodedata.category(c) != "Mn")
-    s = re.sub(r"[^A-Z0-9\s]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = unicodedata.normalize("NFKD", str(x)).encode("ascii", "ignore").decode("ascii").upper()
+    return " ".join(s.translate(_NORM_TABLE).split())
+
+
+def norm_series(s: pd.Series) -> pd.Series:
+    """Version vectorizada de norm_text para columnas completas."""
+    return (
+        s.astype("string").fillna("")
+        .str.normalize("NFKD")
+        .str.encode("ascii", "ignore").str.decode("ascii")
+        .str.upper()
+        .str.translate(_NORM_TABLE)
+        .str.replace(r"\s+", " ", regex=True).str.strip()
+    )
 
 
 def format_usd(n):
@@ -473,6 +506,35 @@ def format_cop(n):
     return "$ " + f"{n:,.0f}".replace(",", ".")
 
 
+def format_usd_series(s: pd.Series) -> pd.Series:
+    """Version vectorizada de format_usd para columnas completas."""
+    n = pd.to_numeric(s, errors="coerce").round()
+    return (
+        n.map("{:,.0f}".format, na_action="ignore").astype("string")
+        .str.replace(",", ".", regex=False)
+        .radd("USD ")
+        .fillna("")
+    )
+
+
+def strip_text(df):
+    """Quita espacios en las columnas de texto; las columnas mixtas (object) pasan a str."""
+    # En pandas 3 las columnas str son Arrow: .str.strip() ya corre el
+    # kernel utf8_trim_whitespace de pyarrow, sin bucle Python por celda.
+    for c in df.columns:
+        if df[c].dtype == "object":
+            df[c] = df[c].astype(str).str.strip()
+        elif pd.api.types.is_string_dtype(df[c].dtype):
+            df[c] = df[c].str.strip()
+
+
+def to_category(df, cols, max_ratio=0.5):
+    """Convierte a category las columnas con pocos valores distintos respecto al total de filas."""
+    for c in cols:
+        if c in df.columns and len(df) and df[c].nunique() / len(df) < max_ratio:
+            df[c] = df[c].astype("category")
+
+
 def get_col(row, *names):
     """Busca una columna por varios nombres posibles (con y sin tilde)."""
     for name in names:
@@ -482,49 +544,186 @@ def get_col(row, *names):
     return ""
 
 
+INFO_HIDDEN_FIELDS = frozenset({"porcentaje de avance", "dept_norm"})
 
-@st.cache_data
-def read_named_table(file_path: str, table_name: str) -> pd.DataFrame:
-    wb = load_workbook(file_path, data_only=True, keep_vba=True)
+
+def info_detail(info_row):
+    """Tabla Campo/Valor del registro de infogeneral, sin los campos internos."""
+    det = pd.DataFrame({"Campo": info_row.columns, "Valor": info_row.iloc[0].values})
+    return det[~det["Campo"].astype(str).str.lower().str.strip().isin(INFO_HIDDEN_FIELDS)]
+
+
+def rows_for_dept(df, rows, dept_norm):
+    """Filas de df del departamento, usando las posiciones precalculadas en load_data."""
+    return df.iloc[rows.get(dept_norm, [])]
+
+
+
+TABLAS_CACHE = ["infogeneral", "plan", "ciclope", "ciclope_ant",
+                "colcol", "contrapartidas", "css"]
+
+
+def cache_key(file_path: str) -> str:
+    """Huella del archivo (mtime + tama\u00f1o) para invalidar la cache en disco."""
+    stat = os.stat(file_path)
+    return hashlib.sha1(
+        stat.st_mtime_ns.to_bytes(8, "little") + stat.st_size.to_bytes(8, "little")
+        + CACHE_VERSION.to_bytes(4, "little")
+    ).hexdigest()
+
+
+def cache_path(key: str, name: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}_{name}.feather")
+
+
+def read_cached_tables(key: str, names):
+    """Lee las tablas desde .cache/ si todas existen; si falta alguna retorna None."""
+    if NO_CACHE:
+        return None
+    paths = [cache_path(key, name) for name in names]
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    try:
+        return [pd.read_feather(p) for p in paths]
+    except Exception:
+        logger.warning("No se pudo leer la cache %s; se relee el .xlsm", key, exc_info=True)
+        return None
+
+
+def write_cached_tables(key: str, names, tables):
+    """Guarda las tablas en Feather; si falla, la app sigue leyendo el .xlsm."""
+    if NO_CACHE:
+        return
+    tmp = None
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        for name, df in zip(names, tables):
+            tmp = cache_path(key, name) + ".tmp"
+            df.reset_index(drop=True).to_feather(tmp, compression="zstd")
+            os.replace(tmp, cache_path(key, name))
+    except Exception:
+        logger.warning("No se pudo guardar la cache Feather en %s", CACHE_DIR, exc_info=True)
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        return
+    prune_cache(key)
+
+
+def prune_cache(key: str):
+    """Borra de .cache/ los archivos de otras claves (versiones anteriores del libro)."""
+    for fname in os.listdir(CACHE_DIR):
+        if fname.startswith(key + "_") or not fname.endswith((".feather", ".feather.tmp")):
+            continue
+        try:
+            os.remove(os.path.join(CACHE_DIR, fname))
+        except OSError:
+            logger.warning("No se pudo borrar %s de la cache", fname, exc_info=True)
+
+
+def calamine_value(v):
+    """Ajusta un valor de calamine al tipo que entrega openpyxl."""
+    if isinstance(v, str):
+        return v if v != "" else None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    if type(v) is date:
+        return datetime(v.year, v.month, v.day)
+    return v
+
+
+def rows_to_frame(rows, nrows):
+    """Arma un DataFrame desde un iterador de filas (la primera es el encabezado) sin lista intermedia."""
+    header = list(next(rows))
+    arr = np.empty((nrows, len(header)), dtype=object)
+    for i, row in enumerate(rows):
+        arr[i] = row
+    return pd.DataFrame(arr, columns=header, copy=False).infer_objects()
+
+
+def open_workbook(file_path: str):
+    """Abre el libro una sola vez (calamine si esta disponible) y ubica sus tablas con nombre.
+
+    Retorna (wb, locs) con locs = {tabla: (hoja, min_row, max_row, min_col, max_col)},
+    filas y columnas desde 1 e incluyendo el encabezado.
+    """
+    if CalamineWorkbook is not None:
+        wb = None
+        try:
+            wb = CalamineWorkbook.from_path(file_path, load_tables=True)
+            locs = {}
+            for name in wb.table_names:
+                t = wb.get_table_by_name(name)
+                # start/end de calamine van desde 0 y marcan solo los datos (sin encabezado)
+                locs[name] = (t.sheet, t.start[0], t.end[0] + 1, t.start[1] + 1, t.end[1] + 1)
+            return wb, locs
+        except (TypeError, AttributeError):
+            # python-calamine anterior a 0.6 no lee tablas: se sigue con openpyxl
+            logger.warning("python-calamine sin soporte de tablas; se usa openpyxl", exc_info=True)
+            if wb is not None:
+                wb.close()
+    from openpyxl import load_workbook
+    from openpyxl.utils.cell import range_boundaries
+
+    # En modo read_only openpyxl no expone ws.tables: la misma carga completa
+    # sirve para ubicar y para leer todas las tablas
+    wb = load_workbook(file_path, data_only=True)
+    locs = {}
     for ws in wb.worksheets:
-        if table_name in ws.tables:
-            tbl = ws.tables[table_name]
-            min_col, min_row, max_col, max_row = range_boundaries(tbl.ref)
-            data = []
-            for row in ws.iter_rows(
-                min_row=min_row, max_row=max_row,
-                min_col=min_col, max_col=max_col,
-                values_only=True
-            ):
-                data.append(list(row))
-            header = data[0]
-            rows = data[1:]
-            return pd.DataFrame(rows, columns=header)
-    raise KeyError(f"No encontre la tabla: {table_name}")
+        for name, ref in ws.tables.items():
+            min_col, min_row, max_col, max_row = range_boundaries(ref)
+            locs[name] = (ws.title, min_row, max_row, min_col, max_col)
+    return wb, locs
+
+
+def read_sheet_frame(wb, sheet: str, min_row=1, max_row=None, min_col=1, max_col=None):
+    """Lee un rango de una hoja del libro abierto como DataFrame."""
+    if CalamineWorkbook is not None and isinstance(wb, CalamineWorkbook):
+        rows = wb.get_sheet_by_name(sheet).to_python(skip_empty_area=False)
+        rows = rows[min_row - 1:max_row]
+        return rows_to_frame(
+            ([calamine_value(v) for v in row[min_col - 1:max_col]] for row in rows),
+            len(rows) - 1,
+        )
+    ws = wb[sheet]
+    if max_row is None:
+        max_row = ws.max_row
+    return rows_to_frame(
+        ws.iter_rows(
+            min_row=min_row, max_row=max_row,
+            min_col=min_col, max_col=max_col,
+            values_only=True
+        ),
+        max_row - min_row,
+    )
 
 
-@st.cache_data
-def load_data():
-    infogeneral = read_named_table(FILE, "infogeneral")
-    plan = read_named_table(FILE, "plan")
-    ciclope = read_named_table(FILE, "Tabla7")  # nuevo corte 2026-2
-    ciclope_ant = read_named_table(FILE, "ciclope20261")  # comparativo 2026-1
-    wb_css = load_workbook(FILE, data_only=True, keep_vba=True)
-    ws_css = wb_css["CSS"]
-    css_data = [list(row) for row in ws_css.iter_rows(values_only=True)]
-    css = pd.DataFrame(css_data[1:], columns=css_data[0])
-    for c in css.columns:
-        if css[c].dtype == "object":
-            css[c] = css[c].astype(str).str.strip()
-    colcol = read_named_table(FILE, "colcol")
-    contrapartidas = read_named_table(FILE, "contrapartidas")
+def read_named_table(wb, locs: dict, table_name: str) -> pd.DataFrame:
+    if table_name not in locs:
+        raise KeyError(f"No encontre la tabla: {table_name}")
+    sheet, min_row, max_row, min_col, max_col = locs[table_name]
+    return read_sheet_frame(wb, sheet, min_row, max_row, min_col, max_col)
+
+
+def read_tables_xlsm():
+    """Lee y limpia las tablas del libro territorial (en el orden de TABLAS_CACHE)."""
+    wb, locs = open_workbook(FILE)
+    try:
+        infogeneral = read_named_table(wb, locs, "infogeneral")
+        plan = read_named_table(wb, locs, "plan")
+        ciclope = read_named_table(wb, locs, "Tabla7")  # nuevo corte 2026-2
+        ciclope_ant = read_named_table(wb, locs, "ciclope20261")  # comparativo 2026-1
+        css = read_sheet_frame(wb, "CSS")
+        colcol = read_named_table(wb, locs, "colcol")
+        contrapartidas = read_named_table(wb, locs, "contrapartidas")
+    finally:
+        wb.close()
     contrapartidas.columns = [str(c).strip().strip("'") for c in contrapartidas.columns]
-    proyectos = read_named_table(FILE, "Tabla7")
 
-    for df in [infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, proyectos]:
-        for c in df.columns:
-            if df[c].dtype == "object":
-                df[c] = df[c].astype(str).str.strip()
+    for df in [infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, css]:
+        strip_text(df)
 
     if "VALOR APORTE (USD)" in ciclope.columns:
         ciclope["VALOR APORTE (USD)"] = pd.to_numeric(
@@ -535,7 +734,48 @@ def load_data():
             ciclope_ant["VALOR APORTE (USD)"], errors="coerce"
         ).fillna(0)
 
-    return infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, proyectos, css
+    infogeneral["DEPT_NORM"] = norm_series(infogeneral[DEPT_COL_INFO])
+    for df in [ciclope, ciclope_ant]:
+        df["DEPT_NORM"] = norm_series(df["DEPARTAMENTO"])
+    colcol["_search_blob"] = pd.Series("", index=colcol.index)
+    for c in COLCOL_DEPT_COLS:
+        if c in colcol.columns:
+            colcol["_search_blob"] += " | " + norm_series(colcol[c])
+
+    for df in [infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, css]:
+        to_category(df, CATEGORY_COLS)
+
+    return [infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, css]
+
+
+@st.cache_data
+def load_data():
+    key = cache_key(FILE)
+    tables = read_cached_tables(key, TABLAS_CACHE)
+    if tables is None:
+        tables = read_tables_xlsm()
+        write_cached_tables(key, TABLAS_CACHE, tables)
+    infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, css = tables
+
+    # Feather no guarda indices: el indice por departamento se arma despues de la cache
+    infogeneral = infogeneral.set_index("DEPT_NORM", drop=False).rename_axis(None)
+
+    # Posiciones de fila por departamento para filtrar sin recorrer toda la tabla
+    dept_rows = {
+        name: df.groupby("DEPT_NORM", sort=False).indices
+        for name, df in [("ciclope", ciclope), ("ciclope_ant", ciclope_ant)]
+    }
+    # Sumas de aporte por departamento para los top 5 de cooperantes y ODS
+    dept_sums = {
+        (name, col): sum_by_dept(df, col, "VALOR APORTE (USD)")
+        for name, df in [("ciclope", ciclope), ("ciclope_ant", ciclope_ant)]
+        for col in ["NOMBRE ACTOR", "ODS"]
+    }
+    # Opciones del selector de departamento
+    depts = sorted(infogeneral[DEPT_COL_INFO].dropna().unique().tolist())
+
+    return (infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, css,
+            dept_rows, dept_sums, depts)
 
 
 @st.cache_data
@@ -547,10 +787,8 @@ def load_sectores():
     css_s = pd.read_excel(FILE_SECTORES, sheet_name="CSS22026")
     colcol_s = pd.read_excel(FILE_SECTORES, sheet_name="COLCOL")
 
-    for df in [info_s, aod_s, css_s, colcol_s]:
-        for c in df.columns:
-            if df[c].dtype == "object":
-                df[c] = df[c].astype(str).str.strip()
+    for df in [info_s, aod_s, aod_s_ant, css_s, colcol_s]:
+        strip_text(df)
 
     if "VALOR APORTE (USD)" in aod_s.columns:
         aod_s["VALOR APORTE (USD)"] = pd.to_numeric(
@@ -646,7 +884,7 @@ def top_by_sum(df, group_col, value_col, n=5):
     if df.empty or group_col not in df.columns or value_col not in df.columns:
         return pd.DataFrame(columns=[group_col, value_col])
     return (
-        df.groupby(group_col, dropna=False)[value_col]
+        df.groupby(group_col, dropna=False, observed=True)[value_col]
         .sum()
         .sort_values(ascending=False)
         .head(n)
@@ -654,6 +892,23 @@ def top_by_sum(df, group_col, value_col, n=5):
     )
 
 
+def sum_by_dept(df, group_col, value_col):
+    """Suma value_col por (DEPT_NORM, group_col); se calcula una vez en load_data."""
+    if group_col not in df.columns or value_col not in df.columns:
+        empty = pd.MultiIndex.from_tuples([], names=["DEPT_NORM", group_col])
+        return pd.Series(index=empty, name=value_col, dtype=float)
+    return df.groupby(["DEPT_NORM", group_col], dropna=False, observed=True)[value_col].sum()
+
+
+def top_for_dept(sums, dept_norm, n=5):
+    """Como top_by_sum, pero sobre las sumas precalculadas de un departamento."""
+    try:
+        dept_sums = sums.loc[dept_norm]
+    except KeyError:
+        return pd.DataFrame(columns=[sums.index.names[1], sums.name])
+    return dept_sums.sort_values(ascending=False).head(n).reset_index()
+
+
 
 ODS_NOMBRES = {
     "ODS 1":  "ODS 1 - Fin de la pobreza",
@@ -681,17 +936,12 @@ def to_excel_ficha(info_row, cic_dept, colcol_dept, contr_dept, css_dept=None):
     output = BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
         if not info_row.empty:
-            df_info = info_row.T.reset_index()
-            df_info.columns = ["Campo", "Valor"]
-            df_info = df_info[
-                ~df_info["Campo"].astype(str).str.lower().str.strip().isin(
-                    ["porcentaje de avance", "dept_norm"]
-                )
-            ]
+            df_info = info_detail(info_row)
             df_info.to_excel(writer, sheet_name="Informacion General", index=False)
         cic_export = cic_dept.drop(columns=["DEPT_NORM"], errors="ignore")
         cic_export.to_excel(writer, sheet_name="AOD - Ciclope", index=False)
-        colcol_dept.copy().to_excel(writer, sheet_name="ColCol", index=False)
+        colcol_export = colcol_dept.drop(columns=["_search_blob"], errors="ignore")
+        colcol_export.to_excel(writer, sheet_name="ColCol", index=False)
         contr_dept.to_excel(writer, sheet_name="Contrapartidas", index=False)
         if css_dept is not None and not css_dept.empty:
             COLS_CSS = [
@@ -836,10 +1086,7 @@ def to_pdf_ficha(dept, info_row, cic_dept, colcol_dept, contr_dept, css_dept=Non
 
         # Registro completo
         story.append(Paragraph("Informaci\u00f3n detallada del departamento", estilo_seccion))
-        df_det = info_row.T.reset_index()
-        df_det.columns = ["Campo", "Valor"]
-        df_det = df_det[~df_det["Campo"].astype(str).str.lower().str.strip().isin(
-            ["porcentaje de avance", "dept_norm"])]
+        df_det = info_detail(info_row)
         df_det = df_det[df_det["Valor"].astype(str).str.strip().isin(["", "None", "nan"]) == False]
 
         tabla_info = []
@@ -874,7 +1121,7 @@ def to_pdf_ficha(dept, info_row, cic_dept, colcol_dept, contr_dept, css_dept=Non
     intervenciones = cic["CODIGO INTERVENCION"].nunique() if "CODIGO INTERVENCION" in cic.columns else 0
     cooperantes = cic["NOMBRE ACTOR"].nunique() if "NOMBRE ACTOR" in cic.columns else 0
     municipios_aod = (
-        cic["MUNICIPIO"].map(norm_text)
+        norm_series(cic["MUNICIPIO"])
         .pipe(lambda s: s[~s.isin(["NO REPORTA", "SIN INFORMACION", "NO APLICA", ""])])
         .nunique() if "MUNICIPIO" in cic.columns else 0
     )
@@ -906,7 +1153,7 @@ def to_pdf_ficha(dept, info_row, cic_dept, colcol_dept, contr_dept, css_dept=Non
 
     # Top cooperantes
     if "NOMBRE ACTOR" in cic.columns and "VALOR APORTE (USD)" in cic.columns:
-        top_coop = (cic.groupby("NOMBRE ACTOR")["VALOR APORTE (USD)"]
+        top_coop = (cic.groupby("NOMBRE ACTOR", observed=True)["VALOR APORTE (USD)"]
                     .sum().sort_values(ascending=False).head(5).reset_index())
         story.append(Paragraph("Top 5 cooperantes por aporte estimado (USD)", estilo_seccion))
         coop_data = [[
@@ -933,7 +1180,7 @@ def to_pdf_ficha(dept, info_row, cic_dept, colcol_dept, contr_dept, css_dept=Non
 
     # Top ODS
     if "ODS" in cic.columns and "VALOR APORTE (USD)" in cic.columns:
-        top_ods = (cic.groupby("ODS")["VALOR APORTE (USD)"]
+        top_ods = (cic.groupby("ODS", observed=True)["VALOR APORTE (USD)"]
                    .sum().sort_values(ascending=False).head(5).reset_index())
         story.append(Paragraph("Top 5 ODS por aporte estimado (USD)", estilo_seccion))
         ods_data = [[
@@ -1356,13 +1603,51 @@ def to_pdf_sectorial(sector, info_sector, aod_sector, css_sector, colcol_sector)
     return output.getvalue()
 
 
+def to_excel_sectorial(info_sector, aod_sector, css_sector, colcol_sector, aod_sector_proj):
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        if not info_sector.empty:
+            info_sector.T.reset_index().rename(columns={"index": "Campo", 0: "Valor"}).to_excel(writer, sheet_name="Info General", index=False)
+        if not aod_sector.empty:
+            aod_sector.to_excel(writer, sheet_name="AOD", index=False)
+        if not css_sector.empty:
+            css_sector.to_excel(writer, sheet_name="CSS", index=False)
+        if not colcol_sector.empty:
+            colcol_sector.to_excel(writer, sheet_name="ColCol", index=False)
+        if not aod_sector_proj.empty:
+            aod_sector_proj.to_excel(writer, sheet_name="Proyectos AOD", index=False)
+    output.seek(0)
+    return output.getvalue()
+
+
+# Las descargas se generan una vez por departamento/sector: los argumentos con "_"
+# no se hashean, y los reruns posteriores reutilizan los bytes ya generados.
+@st.cache_data(show_spinner=False)
+def ficha_territorial_files(dept, _info, _cic_dept, _colcol_dept, _contr_dept, _css_dept):
+    """Bytes del Excel y del PDF de la ficha territorial."""
+    return (
+        to_excel_ficha(_info, _cic_dept, _colcol_dept, _contr_dept, _css_dept),
+        to_pdf_ficha(dept, _info, _cic_dept, _colcol_dept, _contr_dept, _css_dept),
+    )
+
+
+@st.cache_data(show_spinner=False)
+def ficha_sectorial_files(sector, _info_sector, _aod_sector, _css_sector, _colcol_sector, _aod_sector_proj):
+    """Bytes del Excel y del PDF de la ficha sectorial."""
+    return (
+        to_excel_sectorial(_info_sector, _aod_sector, _css_sector, _colcol_sector, _aod_sector_proj),
+        to_pdf_sectorial(sector, _info_sector, _aod_sector, _css_sector, _colcol_sector),
+    )
+
+
 
 # -------------------------
 # APP
 # -------------------------
 
 # Load data
-infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, proyectos, css = load_data()
+(infogeneral, plan, ciclope, ciclope_ant, colcol, contrapartidas, css,
+ dept_rows, dept_sums, depts) = load_data()
 info_s, aod_s, aod_s_ant, css_s, colcol_s = load_sectores()
 geo = load_geo()
 
@@ -1402,18 +1687,11 @@ nav = st.radio("", nav_options, horizontal=True, label_visibility="collapsed",
 st.markdown("---")
 
 
-DEPT_COL_INFO = "Departamento"
-depts = sorted(infogeneral[DEPT_COL_INFO].dropna().unique().tolist())
-
 # Pre-compute map data (interventions by dept for choropleth)
-ciclope["DEPT_NORM"] = ciclope["DEPARTAMENTO"].map(norm_text)
-ciclope_ant["DEPT_NORM"] = ciclope_ant["DEPARTAMENTO"].map(norm_text)
-proyectos["DEPT_NORM"] = proyectos["DEPARTAMENTO"].map(norm_text)
-
 # Build dept_interventions with norm_text keys to match GeoJSON
 _di_raw = (
     ciclope[ciclope["DEPARTAMENTO"] != "\u00c1mbito Nacional"]
-    .groupby("DEPARTAMENTO")["CODIGO INTERVENCION"].nunique()
+    .groupby("DEPARTAMENTO", observed=True)["CODIGO INTERVENCION"].nunique()
 )
 dept_interventions = {norm_text(k): v for k, v in _di_raw.items()}
 
@@ -1422,33 +1700,30 @@ dept_interventions = {norm_text(k): v for k, v in _di_raw.items()}
 # FICHA TERRITORIAL
 # =============================================================
 if nav == "\U0001f5fa\ufe0f Ficha Territorial":
+    import altair as alt
 
     dept = st.selectbox("\U0001f5fa\ufe0f Selecciona un departamento", depts)
 
-    infogeneral["DEPT_NORM"] = infogeneral[DEPT_COL_INFO].map(norm_text)
     dept_norm = norm_text(dept)
-    info = infogeneral[infogeneral["DEPT_NORM"] == dept_norm].head(1)
-    cic_dept = ciclope[ciclope["DEPT_NORM"] == dept_norm]
-    cic_dept_ant = ciclope_ant[ciclope_ant["DEPT_NORM"] == dept_norm]
-    proj_dept = proyectos[proyectos["DEPT_NORM"] == dept_norm]
-    css_dept = css[css["ESPACIO VINCULADO"].map(norm_text) == dept_norm]
-
-    mask_colcol = pd.Series(False, index=colcol.index)
-    if "DEPARTAMENTOS PARTICIPANTES" in colcol.columns:
-        mask_colcol = (
-            colcol["DEPARTAMENTOS PARTICIPANTES"]
-            .astype("string").map(norm_text)
-            .str.contains(dept_norm, na=False)
-        )
-    colcol_dept = colcol[mask_colcol]
+    if dept_norm in infogeneral.index:
+        info = infogeneral.loc[[dept_norm]].head(1)
+    else:
+        info = infogeneral.iloc[0:0]
+    cic_dept = rows_for_dept(ciclope, dept_rows["ciclope"], dept_norm)
+    cic_dept_ant = rows_for_dept(ciclope_ant, dept_rows["ciclope_ant"], dept_norm)
+    # Los proyectos AOD activos son las mismas filas de Tabla7 que ciclope
+    proj_dept = cic_dept
+    css_dept = css[norm_series(css["ESPACIO VINCULADO"]) == dept_norm]
+
+    colcol_dept = colcol[colcol["_search_blob"].str.contains(dept_norm, regex=False, na=False)]
 
     if "Departamento" in contrapartidas.columns:
         contr_dept = contrapartidas[
-            contrapartidas["Departamento"].astype("string").map(norm_text) == dept_norm
+            norm_series(contrapartidas["Departamento"]) == dept_norm
         ]
     else:
         contr_dept = contrapartidas.iloc[0:0]
-    proj_dept_ant = ciclope_ant[ciclope_ant["DEPT_NORM"] == dept_norm]
+    proj_dept_ant = cic_dept_ant
 
 
     st.markdown(
@@ -1472,10 +1747,7 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
             pob_fmt = str(pob_raw)
         c3.metric("Poblaci\u00f3n", pob_fmt)
         with st.expander("Ver registro completo del departamento"):
-            df_det = info.T.reset_index()
-            df_det.columns = ["Campo", "Valor"]
-            df_det = df_det[~df_det["Campo"].astype(str).str.lower().str.strip().isin(
-                ["porcentaje de avance", "dept_norm"])]
+            df_det = info_detail(info)
             st.dataframe(df_det, use_container_width=True, hide_index=True)
 
     # ---- AOD ----
@@ -1514,12 +1786,12 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
             f'<div class="metric-custom-delta" style="color:{delta_coop_color};">{delta_coop_str}</div></div>',
             unsafe_allow_html=True)
     municipios_count = (
-        cic_dept["MUNICIPIO"].map(norm_text)
+        norm_series(cic_dept["MUNICIPIO"])
         .pipe(lambda s: s[~s.isin(["NO REPORTA", "SIN INFORMACION", "NO APLICA", ""])])
         .nunique() if "MUNICIPIO" in cic_dept.columns else 0
     )
     municipios_count_ant = (
-        cic_dept_ant["MUNICIPIO"].map(norm_text)
+        norm_series(cic_dept_ant["MUNICIPIO"])
         .pipe(lambda s: s[~s.isin(["NO REPORTA", "SIN INFORMACION", "NO APLICA", ""])])
         .nunique() if "MUNICIPIO" in cic_dept_ant.columns else 0
     )
@@ -1554,7 +1826,7 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
     c5, c6 = st.columns(2)
     with c5:
         st.markdown("**Top 5 cooperantes por USD**")
-        top_act = top_by_sum(cic_dept, "NOMBRE ACTOR", "VALOR APORTE (USD)", 5)
+        top_act = top_for_dept(dept_sums["ciclope", "NOMBRE ACTOR"], dept_norm, 5)
         if not top_act.empty:
             chart_act = (
                 alt.Chart(top_act)
@@ -1566,21 +1838,21 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
                 ).properties(height=200)
             )
             st.altair_chart(chart_act, use_container_width=True)
-            top_act_ant = top_by_sum(cic_dept_ant, "NOMBRE ACTOR", "VALOR APORTE (USD)", 5)
+            top_act_ant = top_for_dept(dept_sums["ciclope_ant", "NOMBRE ACTOR"], dept_norm, 5)
             top_act_disp = top_act.copy()
             top_act_disp.columns = ["NOMBRE ACTOR", "USD 2026-2"]
-            top_act_disp["USD 2026-2"] = top_act_disp["USD 2026-2"].apply(format_usd)
+            top_act_disp["USD 2026-2"] = format_usd_series(top_act_disp["USD 2026-2"])
             if not top_act_ant.empty:
                 top_act_ant_disp = top_act_ant.copy()
                 top_act_ant_disp.columns = ["NOMBRE ACTOR", "USD 2026-1"]
-                top_act_ant_disp["USD 2026-1"] = top_act_ant_disp["USD 2026-1"].apply(format_usd)
+                top_act_ant_disp["USD 2026-1"] = format_usd_series(top_act_ant_disp["USD 2026-1"])
                 top_act_disp = top_act_disp.merge(top_act_ant_disp, on="NOMBRE ACTOR", how="left").fillna("-")
             st.dataframe(top_act_disp, use_container_width=True, hide_index=True)
         else:
             st.info("Sin datos suficientes para cooperantes.")
     with c6:
         st.markdown("**Top 5 ODS por USD**")
-        top_ods = top_by_sum(cic_dept, "ODS", "VALOR APORTE (USD)", 5)
+        top_ods = top_for_dept(dept_sums["ciclope", "ODS"], dept_norm, 5)
         if not top_ods.empty:
             chart_ods = (
                 alt.Chart(top_ods)
@@ -1592,16 +1864,16 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
                 ).properties(height=200)
             )
             st.altair_chart(chart_ods, use_container_width=True)
-            top_ods_ant = top_by_sum(cic_dept_ant, "ODS", "VALOR APORTE (USD)", 5)
+            top_ods_ant = top_for_dept(dept_sums["ciclope_ant", "ODS"], dept_norm, 5)
             top_ods_disp = top_ods.copy()
             top_ods_disp.columns = ["ODS", "USD 2026-2"]
             top_ods_disp["ODS"] = top_ods_disp["ODS"].map(lambda x: ODS_NOMBRES.get(x, x))
-            top_ods_disp["USD 2026-2"] = top_ods_disp["USD 2026-2"].apply(format_usd)
+            top_ods_disp["USD 2026-2"] = format_usd_series(top_ods_disp["USD 2026-2"])
             if not top_ods_ant.empty:
                 top_ods_ant_disp = top_ods_ant.copy()
                 top_ods_ant_disp.columns = ["ODS", "USD 2026-1"]
                 top_ods_ant_disp["ODS"] = top_ods_ant_disp["ODS"].map(lambda x: ODS_NOMBRES.get(x, x))
-                top_ods_ant_disp["USD 2026-1"] = top_ods_ant_disp["USD 2026-1"].apply(format_usd)
+                top_ods_ant_disp["USD 2026-1"] = format_usd_series(top_ods_ant_disp["USD 2026-1"])
                 top_ods_disp = top_ods_disp.merge(top_ods_ant_disp, on="ODS", how="left").fillna("-")
             st.dataframe(top_ods_disp, use_container_width=True, hide_index=True)
         else:
@@ -1621,22 +1893,22 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
             "A\u00d1O DE REALIZACI\u00d3N ", "ENTIDAD SOCIA NACIONAL",
             "PRESUPUESTO ESTIMADO APC COLOMBIA"
         ]
-        colcol_view = colcol_dept.copy()
+        cols_cc_show = [c for c in COLS_CC if c in colcol_dept.columns]
+        colcol_view = colcol_dept[cols_cc_show].copy()
         if "PRESUPUESTO ESTIMADO APC COLOMBIA" in colcol_view.columns:
             colcol_view["PRESUPUESTO ESTIMADO APC COLOMBIA"] = (
                 pd.to_numeric(colcol_view["PRESUPUESTO ESTIMADO APC COLOMBIA"], errors="coerce")
                 .apply(format_cop)
             )
-        cols_cc_show = [c for c in COLS_CC if c in colcol_view.columns]
-        st.dataframe(colcol_view[cols_cc_show], use_container_width=True, hide_index=True)
+        st.dataframe(colcol_view, use_container_width=True, hide_index=True)
     with p2:
         st.markdown("**Contrapartidas**")
         st.metric("Registros encontrados", len(contr_dept))
-        contr_view = contr_dept.copy()
+        contr_view = contr_dept.iloc[:50].copy()
         for col in contr_view.columns:
             if str(col).strip().strip("\'") in ["Monto por APC", "Monto total", "Monto total "]:
                 contr_view[col] = pd.to_numeric(contr_view[col], errors="coerce").apply(format_cop)
-        st.dataframe(contr_view.head(50), use_container_width=True, hide_index=True)
+        st.dataframe(contr_view, use_container_width=True, hide_index=True)
 
     # ---- CSS ----
     st.markdown('<div class="section-header">Proyectos de Cooperaci\u00f3n Sur Sur aprobados y vigentes</div>', unsafe_allow_html=True)
@@ -1659,7 +1931,11 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
     # ---- Proyectos AOD ----
     st.markdown('<div class="section-header">Proyectos AOD activos</div>', unsafe_allow_html=True)
     st.caption("Fuente: C\u00edclope a corte de 10 de julio de 2026")
-    df_aod_terr = proj_dept.drop(columns=["DEPT_NORM"], errors="ignore").copy()
+    COLS_SHOW = ["CODIGO INTERVENCION", "NOMBRE INTERVENCION", "OBJETIVO GENERAL",
+                 "FECHA INICIAL", "FECHA FINAL", "DEPARTAMENTO", "MUNICIPIO",
+                 "NOMBRE ACTOR", "ENCI PRIMER NIVEL", "ODS", "SECTORES GOB"]
+    # Solo las columnas visibles: sin DEPT_NORM
+    df_aod_terr = proj_dept[[c for c in COLS_SHOW if c in proj_dept.columns]]
     proy_unicos_terr = df_aod_terr["CODIGO INTERVENCION"].nunique() if "CODIGO INTERVENCION" in df_aod_terr.columns else len(df_aod_terr)
     proy_ant_t = proj_dept_ant["CODIGO INTERVENCION"].nunique() if "CODIGO INTERVENCION" in proj_dept_ant.columns else 0
     delta_pt = proy_unicos_terr - proy_ant_t
@@ -1671,16 +1947,14 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
         f'<div class="metric-custom-value">{proy_unicos_terr}</div>'
         f'<div class="metric-custom-delta" style="color:{delta_pt_col};">{delta_pt_str}</div></div>',
         unsafe_allow_html=True)
-    COLS_SHOW = ["CODIGO INTERVENCION", "NOMBRE INTERVENCION", "OBJETIVO GENERAL",
-                 "FECHA INICIAL", "FECHA FINAL", "DEPARTAMENTO", "MUNICIPIO",
-                 "NOMBRE ACTOR", "ENCI PRIMER NIVEL", "ODS", "SECTORES GOB"]
-    cols_show = [c for c in COLS_SHOW if c in df_aod_terr.columns]
-    st.dataframe(df_aod_terr[cols_show], use_container_width=True, hide_index=True)
+    st.dataframe(df_aod_terr, use_container_width=True, hide_index=True)
 
     # ---- Descargas (al final, incluye todo) ----
     st.markdown("---")
     st.markdown("**Descargar ficha territorial completa**")
-    excel_ficha = to_excel_ficha(info, cic_dept, colcol_dept, contr_dept, css_dept)
+    excel_ficha, pdf_ficha = ficha_territorial_files(
+        dept, info, cic_dept, colcol_dept, contr_dept, css_dept
+    )
     col_pdf, col_xlsx = st.columns(2)
     with col_xlsx:
         st.download_button(
@@ -1690,7 +1964,6 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
     with col_pdf:
-        pdf_ficha = to_pdf_ficha(dept, info, cic_dept, colcol_dept, contr_dept, css_dept)
         st.download_button(
             label="\U0001f4e5 Descargar en PDF",
             data=pdf_ficha,
@@ -1707,6 +1980,7 @@ if nav == "\U0001f5fa\ufe0f Ficha Territorial":
 # FICHA SECTORIAL
 # =============================================================
 elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
+    import altair as alt
 
     sectores_list = info_s["Nombre del sector"].dropna().tolist()
     sector = st.selectbox("\U0001f3db\ufe0f Selecciona un sector", sectores_list)
@@ -1719,7 +1993,7 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
 
     # Info general del sector
     st.markdown('<div class="section-header">Informaci\u00f3n General del Sector</div>', unsafe_allow_html=True)
-    info_sector = info_s[info_s["Nombre del sector"].map(norm_text) == sector_norm]
+    info_sector = info_s[norm_series(info_s["Nombre del sector"]) == sector_norm]
     if not info_sector.empty:
         row = info_sector.iloc[0]
         sg1, sg2 = st.columns(2)
@@ -1734,13 +2008,13 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
     st.markdown('<div class="section-header">Ayuda Oficial al Desarrollo (AOD)</div>', unsafe_allow_html=True)
     st.caption("Fuente: C\u00edclope a corte de 10 de julio de 2026")
 
-    aod_sector = aod_s[aod_s["SECTORES GOB"].map(norm_text).str.contains(sector_norm, na=False)]
+    aod_sector = aod_s[norm_series(aod_s["SECTORES GOB"]).str.contains(sector_norm, na=False)]
 
     if aod_sector.empty:
         st.info("No se encontraron intervenciones de AOD para este sector.")
     else:
         aod_sector["VALOR APORTE (USD)"] = pd.to_numeric(aod_sector["VALOR APORTE (USD)"], errors="coerce").fillna(0)
-        aod_sector_ant = aod_s_ant[aod_s_ant["SECTORES GOB"].map(norm_text).str.contains(sector_norm, na=False)].copy()
+        aod_sector_ant = aod_s_ant[norm_series(aod_s_ant["SECTORES GOB"]).str.contains(sector_norm, na=False)].copy()
         if "VALOR APORTE (USD)" in aod_sector_ant.columns:
             aod_sector_ant["VALOR APORTE (USD)"] = pd.to_numeric(aod_sector_ant["VALOR APORTE (USD)"], errors="coerce").fillna(0)
         int_s2 = aod_sector["CODIGO INTERVENCION"].nunique() if "CODIGO INTERVENCION" in aod_sector.columns else 0
@@ -1792,11 +2066,11 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
                 top_coop_s_ant = top_by_sum(aod_sector_ant, "NOMBRE ACTOR", "VALOR APORTE (USD)", 5)
                 top_coop_s_disp = top_coop_s.copy()
                 top_coop_s_disp.columns = ["NOMBRE ACTOR", "USD 2026-2"]
-                top_coop_s_disp["USD 2026-2"] = top_coop_s_disp["USD 2026-2"].apply(format_usd)
+                top_coop_s_disp["USD 2026-2"] = format_usd_series(top_coop_s_disp["USD 2026-2"])
                 if not top_coop_s_ant.empty:
                     tc1 = top_coop_s_ant.copy()
                     tc1.columns = ["NOMBRE ACTOR", "USD 2026-1"]
-                    tc1["USD 2026-1"] = tc1["USD 2026-1"].apply(format_usd)
+                    tc1["USD 2026-1"] = format_usd_series(tc1["USD 2026-1"])
                     top_coop_s_disp = top_coop_s_disp.merge(tc1, on="NOMBRE ACTOR", how="left").fillna("-")
                 st.dataframe(top_coop_s_disp, use_container_width=True, hide_index=True)
 
@@ -1818,12 +2092,12 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
                 top_ods_s_disp = top_ods_s.copy()
                 top_ods_s_disp.columns = ["ODS", "USD 2026-2"]
                 top_ods_s_disp["ODS"] = top_ods_s_disp["ODS"].map(lambda x: ODS_NOMBRES.get(x, x))
-                top_ods_s_disp["USD 2026-2"] = top_ods_s_disp["USD 2026-2"].apply(format_usd)
+                top_ods_s_disp["USD 2026-2"] = format_usd_series(top_ods_s_disp["USD 2026-2"])
                 if not top_ods_s_ant.empty:
                     to1 = top_ods_s_ant.copy()
                     to1.columns = ["ODS", "USD 2026-1"]
                     to1["ODS"] = to1["ODS"].map(lambda x: ODS_NOMBRES.get(x, x))
-                    to1["USD 2026-1"] = to1["USD 2026-1"].apply(format_usd)
+                    to1["USD 2026-1"] = format_usd_series(to1["USD 2026-1"])
                     top_ods_s_disp = top_ods_s_disp.merge(to1, on="ODS", how="left").fillna("-")
                 st.dataframe(top_ods_s_disp, use_container_width=True, hide_index=True)
 
@@ -1832,7 +2106,7 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
     st.markdown('<div class="section-header">Proyectos de Cooperaci\u00f3n Sur Sur</div>', unsafe_allow_html=True)
     st.caption("Datos actualizados a abril de 2026 \u00b7 APC Colombia, Direcci\u00f3n de Oferta")
 
-    css_sector = css_s[css_s["ESPACIO VINCULADO"].map(norm_text).str.contains(sector_norm, na=False)]
+    css_sector = css_s[norm_series(css_s["ESPACIO VINCULADO"]).str.contains(sector_norm, na=False)]
     if css_sector.empty:
         st.info("No se encontraron proyectos CSS para este sector.")
     else:
@@ -1847,7 +2121,7 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
 
     # ColCol del sector
     st.markdown('<div class="section-header">Colombia Ense\u00f1a Colombia (ColCol)</div>', unsafe_allow_html=True)
-    colcol_sector = colcol_s[colcol_s["SECTOR VINCULADO"].map(norm_text).str.contains(sector_norm, na=False)]
+    colcol_sector = colcol_s[norm_series(colcol_s["SECTOR VINCULADO"]).str.contains(sector_norm, na=False)]
     if colcol_sector.empty:
         st.info("No se encontraron intercambios ColCol para este sector.")
     else:
@@ -1872,7 +2146,7 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
     # ---- Proyectos AOD del sector ----
     st.markdown('<div class="section-header">Proyectos AOD del sector</div>', unsafe_allow_html=True)
     st.caption("Fuente: C\u00edclope a corte de 10 de julio de 2026")
-    aod_sector_proj = aod_s[aod_s["SECTORES GOB"].map(norm_text).str.contains(sector_norm, na=False)].copy()
+    aod_sector_proj = aod_s[norm_series(aod_s["SECTORES GOB"]).str.contains(sector_norm, na=False)].copy()
     aod_sector_proj = aod_sector_proj.drop(columns=["DEPT_NORM"] if "DEPT_NORM" in aod_sector_proj.columns else [], errors="ignore")
     COLS_AOD_S = ["NOMBRE INTERVENCION", "OBJETIVO GENERAL", "FECHA INICIAL", "FECHA FINAL",
                   "DEPARTAMENTO", "MUNICIPIO", "NOMBRE ACTOR", "ENCI PRIMER NIVEL", "ODS", "SECTORES GOB"]
@@ -1883,7 +2157,7 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
     cols_aod_s = [c for c in COLS_AOD_S if c in aod_sector_proj.columns]
     if not aod_sector_proj.empty:
         proy_unicos_sect = aod_sector_proj["CODIGO INTERVENCION"].nunique() if "CODIGO INTERVENCION" in aod_sector_proj.columns else len(aod_sector_proj)
-        aod_sp_ant = aod_s_ant[aod_s_ant["SECTORES GOB"].map(norm_text).str.contains(sector_norm, na=False)]
+        aod_sp_ant = aod_s_ant[norm_series(aod_s_ant["SECTORES GOB"]).str.contains(sector_norm, na=False)]
         proy_sect_ant = aod_sp_ant["CODIGO INTERVENCION"].nunique() if "CODIGO INTERVENCION" in aod_sp_ant.columns else 0
         d_ps = proy_unicos_sect - proy_sect_ant
         d_ps_str = ("\u25b2 " if d_ps >= 0 else "\u25bc ") + str(abs(d_ps)) + " vs. 2026-1"
@@ -1901,20 +2175,9 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
     # ---- Descargas Ficha Sectorial ----
     st.markdown("---")
     st.markdown("**Descargar ficha sectorial completa**")
-    output_s = BytesIO()
-    with pd.ExcelWriter(output_s, engine="openpyxl") as writer:
-        if not info_sector.empty:
-            info_sector.T.reset_index().rename(columns={"index": "Campo", 0: "Valor"}).to_excel(writer, sheet_name="Info General", index=False)
-        if not aod_sector.empty:
-            aod_sector.to_excel(writer, sheet_name="AOD", index=False)
-        if not css_sector.empty:
-            css_sector.to_excel(writer, sheet_name="CSS", index=False)
-        if not colcol_sector.empty:
-            colcol_sector.to_excel(writer, sheet_name="ColCol", index=False)
-        if not aod_sector_proj.empty:
-            aod_sector_proj.to_excel(writer, sheet_name="Proyectos AOD", index=False)
-    output_s.seek(0)
-    excel_sector = output_s.getvalue()
+    excel_sector, pdf_sector = ficha_sectorial_files(
+        sector, info_sector, aod_sector, css_sector, colcol_sector, aod_sector_proj
+    )
     col_s1, col_s2 = st.columns(2)
     with col_s1:
         st.download_button(
@@ -1924,7 +2187,6 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
             mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         )
     with col_s2:
-        pdf_sector = to_pdf_sectorial(sector, info_sector, aod_sector, css_sector, colcol_sector)
         st.download_button(
             label="\U0001f4e5 Descargar en PDF",
             data=pdf_sector,
@@ -1940,6 +2202,7 @@ elif nav == "\U0001f3db\ufe0f Ficha Sectorial":
 # PANORAMA NACIONAL
 # =============================================================
 elif nav == "\U0001f310 Panorama Nacional":
+    import altair as alt
 
     st.markdown(
         '<div class="dept-title-banner">\U0001f310 Panorama Nacional de la Cooperaci\u00f3n Internacional</div>',
@@ -2010,7 +2273,7 @@ elif nav == "\U0001f310 Panorama Nacional":
     with c_n1:
         st.markdown("**Top 10 cooperantes por recursos (USD)**")
         top_coop_usd = (
-            cic_nacional.groupby("NOMBRE ACTOR")["VALOR APORTE (USD)"]
+            cic_nacional.groupby("NOMBRE ACTOR", observed=True)["VALOR APORTE (USD)"]
             .sum().sort_values(ascending=False).head(10).reset_index()
         )
         if not top_coop_usd.empty:
@@ -2026,13 +2289,13 @@ elif nav == "\U0001f310 Panorama Nacional":
             )
             st.altair_chart(chart_coop_usd, use_container_width=True)
             top_coop_usd_disp = top_coop_usd.copy()
-            top_coop_usd_disp["VALOR APORTE (USD)"] = top_coop_usd_disp["VALOR APORTE (USD)"].apply(format_usd)
+            top_coop_usd_disp["VALOR APORTE (USD)"] = format_usd_series(top_coop_usd_disp["VALOR APORTE (USD)"])
             st.dataframe(top_coop_usd_disp, use_container_width=True, hide_index=True)
 
     with c_n2:
         st.markdown("**Top 10 cooperantes por n\u00famero de intervenciones**")
         top_coop_int = (
-            cic_nacional.groupby("NOMBRE ACTOR")["CODIGO INTERVENCION"]
+            cic_nacional.groupby("NOMBRE ACTOR", observed=True)["CODIGO INTERVENCION"]
             .nunique().sort_values(ascending=False).head(10).reset_index()
         )
         top_coop_int.columns = ["NOMBRE ACTOR", "INTERVENCIONES"]
@@ -2056,7 +2319,7 @@ elif nav == "\U0001f310 Panorama Nacional":
     with c_n3:
         st.markdown("**Top 10 ODS por recursos (USD)**")
         top_ods_nac = (
-            cic_nacional.groupby("ODS")["VALOR APORTE (USD)"]
+            cic_nacional.groupby("ODS", observed=True)["VALOR APORTE (USD)"]
             .sum().sort_values(ascending=False).head(10).reset_index()
         )
         if not top_ods_nac.empty:
@@ -2072,7 +2335,7 @@ elif nav == "\U0001f310 Panorama Nacional":
             )
             st.altair_chart(chart_ods_nac, use_container_width=True)
             top_ods_nac_disp = top_ods_nac.copy()
-            top_ods_nac_disp["VALOR APORTE (USD)"] = top_ods_nac_disp["VALOR APORTE (USD)"].apply(format_usd)
+            top_ods_nac_disp["VALOR APORTE (USD)"] = format_usd_series(top_ods_nac_disp["VALOR APORTE (USD)"])
             top_ods_nac_disp["ODS"] = top_ods_nac_disp["ODS"].map(lambda x: ODS_NOMBRES.get(x, x))
             st.dataframe(top_ods_nac_disp, use_container_width=True, hide_index=True)
 
@@ -2095,7 +2358,7 @@ elif nav == "\U0001f310 Panorama Nacional":
             )
             st.altair_chart(chart_sect_nac, use_container_width=True)
             top_sect_nac_disp = top_sect_nac.copy()
-            top_sect_nac_disp["VALOR APORTE (USD)"] = top_sect_nac_disp["VALOR APORTE (USD)"].apply(format_usd)
+            top_sect_nac_disp["VALOR APORTE (USD)"] = format_usd_series(top_sect_nac_disp["VALOR APORTE (USD)"])
             st.dataframe(top_sect_nac_disp, use_container_width=True, hide_index=True)
 
     st.markdown('<div class="section-header">Departamentos</div>', unsafe_allow_html=True)
@@ -2105,7 +2368,7 @@ elif nav == "\U0001f310 Panorama Nacional":
         st.markdown("**Top 10 departamentos por recursos (USD)**")
         top_dept_usd = (
             cic_nacional[cic_nacional["DEPARTAMENTO"] != "\u00c1mbito Nacional"]
-            .groupby("DEPARTAMENTO")["VALOR APORTE (USD)"]
+            .groupby("DEPARTAMENTO", observed=True)["VALOR APORTE (USD)"]
             .sum().sort_values(ascending=False).head(10).reset_index()
         )
         if not top_dept_usd.empty:
@@ -2121,14 +2384,14 @@ elif nav == "\U0001f310 Panorama Nacional":
             )
             st.altair_chart(chart_dept_usd, use_container_width=True)
             top_dept_usd_disp = top_dept_usd.copy()
-            top_dept_usd_disp["VALOR APORTE (USD)"] = top_dept_usd_disp["VALOR APORTE (USD)"].apply(format_usd)
+            top_dept_usd_disp["VALOR APORTE (USD)"] = format_usd_series(top_dept_usd_disp["VALOR APORTE (USD)"])
             st.dataframe(top_dept_usd_disp, use_container_width=True, hide_index=True)
 
     with c_n6:
         st.markdown("**Top 10 departamentos por intervenciones**")
         top_dept_int = (
             cic_nacional[cic_nacional["DEPARTAMENTO"] != "\u00c1mbito Nacional"]
-            .groupby("DEPARTAMENTO")["CODIGO INTERVENCION"]
+            .groupby("DEPARTAMENTO", observed=True)["CODIGO INTERVENCION"]
             .nunique().sort_values(ascending=False).head(10).reset_index()
         )
         top_dept_int.columns = ["DEPARTAMENTO", "INTERVENCIONES"]